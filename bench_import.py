@@ -0,0 +1,38 @@
+import sys, os, os.path
+import subprocess
+import time
+
+__author__ = 'Flier Lu'
+
+STATEMENTS = [
+    ('python', 'pass'),
+    ('import vpx', 'import vpx'),
+    ('import pyvpx', 'import pyvpx'),
+    ('import pyvpx + Encoder', 'import pyvpx; pyvpx.Encoder(320, 240).close()'),
+    ('import pyvpx + Decoder', 'import pyvpx; pyvpx.Decoder().close()'),
+]
+
+def measure(stmt, runs):
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    times = []
+
+    for i in range(runs):
+        start = time.time()
+
+        subprocess.check_call([sys.executable, '-c', stmt], cwd=cwd)
+
+        times.append(time.time() - start)
+
+    times.sort()
+
+    return times[0], times[len(times) // 2]
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    print("%-24s %10s %10s" % ("statement", "min (ms)", "median (ms)"))
+
+    for name, stmt in STATEMENTS:
+        best, median = measure(stmt, runs)
+
+        print("%-24s %10.2f %10.2f" % (name, best * 1000, median * 1000))
@@ -1,22 +1,50 @@
-import vpx
+import array
+import mmap
+import time
 
 __author__ = 'Flier Lu'
 
+class LazyModule(object):
+    "Import the module on the first attribute access, to keep the import time of pyvpx low"
+    def __init__(self, name):
+        self.__name = name
+        self.__module = None
+
+    def __getattr__(self, name):
+        if self.__module is None:
+            self.__module = __import__(self.__name)
+
+        value = getattr(self.__module, name)
+
+        setattr(self, name, value)
+
+        return value
+
+vpx = LazyModule('vpx')
+
 class VpxError(Exception):
     def __init__(self, errno):
         Exception.__init__(self, vpx.vpx_codec_err_to_string(errno))
         self.errno = errno
 
+    def __reduce__(self):
+        return VpxError, (self.errno,)
+
     @staticmethod
     def check(errno):
         if errno != vpx.VPX_CODEC_OK:
             raise VpxError(errno)
 
 class Image(object):
-    def __init__(self, width=0, height=0, fmt=vpx.VPX_IMG_FMT_I420, data=None, align=1, img=None):
+    def __init__(self, width=0, height=0, fmt=None, data=None, align=1, img=None):
+        self.buffer = data # the wrapped storage must live as long as the image
+
         if img:
             self.img = img
         else:
+            if fmt is None:
+                fmt = vpx.VPX_IMG_FMT_I420
+
             self.img = vpx.vpx_image_t()
 
             if data:
@@ -56,6 +84,84 @@ class Image(object):
 
         return dst_or_fmt
 
+    def scaleTo(self, dst_or_width, height=None, filter=None, threads=1):
+        "Scale the image to a destination image, an image pool or a new image of the given size"
+        if filter is None:
+            filter = vpx.VPX_SCALE_BILINEAR
+
+        pool = dst_or_width if isinstance(dst_or_width, ImagePool) else None
+
+        if pool is not None:
+            dst = pool.acquire()
+        elif type(dst_or_width) != Image:
+            dst = Image(dst_or_width, height, self.format)
+        else:
+            dst = dst_or_width
+
+        try:
+            if threads > 1 and dst.height > 2 * threads:
+                self.scaleBands(dst, filter, threads)
+            else:
+                vpx.vpx_img_scale_to(self.img, dst.img, filter)
+        except Exception:
+            # give back the destination we acquired or allocated
+            if pool is not None:
+                pool.release(dst)
+            elif dst is not dst_or_width:
+                dst.free()
+
+            raise
+
+        return dst
+
+    def scaleBands(self, dst, filter, threads):
+        import threading
+
+        rows = dst.height
+        step = ((rows + threads - 1) // threads + 1) & ~1
+        errors = []
+
+        def scale_band(begin, end):
+            try:
+                vpx.vpx_img_scale_rows(self.img, dst.img, filter, begin, end)
+            except Exception as e:
+                errors.append(e)
+
+        # validate the formats and filter once, before starting the bands
+        vpx.vpx_img_scale_rows(self.img, dst.img, filter, 0, 0)
+
+        bands = [threading.Thread(target=scale_band, args=(begin, min(begin + step, rows)))
+                 for begin in range(step, rows, step)]
+
+        for band in bands:
+            band.start()
+
+        scale_band(0, step)
+
+        for band in bands:
+            band.join()
+
+        if errors:
+            raise errors[0]
+
+    def thumbnail(self, width, height=None, filter=None, pool=None):
+        "Return a reduced size RGB24 image, scaled down on the YUV planes before the color conversion"
+        if filter is None:
+            filter = vpx.VPX_SCALE_BOX
+
+        if height is None:
+            height = (width * self.height // self.width + 1) & ~1
+
+        small = self.scaleTo(width if pool is None else pool, height, filter)
+
+        try:
+            return small.convertTo(vpx.VPX_IMG_FMT_RGB24)
+        finally:
+            if pool is not None:
+                pool.release(small)
+            else:
+                small.free()
+
     def asPilImage(self):
         import Image
 
@@ -92,6 +198,40 @@ class Image(object):
     def data(self):
         return vpx.vpx_img_get_data(self.img)
     
+class ImagePool(object):
+    "A free list of same sized images, to avoid allocating a new image for each frame"
+    def __init__(self, width, height, fmt=None, align=1):
+        self.width = width
+        self.height = height
+        self.fmt = vpx.VPX_IMG_FMT_I420 if fmt is None else fmt
+        self.align = align
+        self.images = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.free()
+
+    def __len__(self):
+        return len(self.images)
+
+    def acquire(self):
+        if self.images:
+            return self.images.pop()
+
+        return Image(self.width, self.height, self.fmt, align=self.align)
+
+    def release(self, img):
+        if (img.width, img.height, img.format) != (self.width, self.height, self.fmt):
+            raise ValueError("the image doesn't match the pool")
+
+        self.images.append(img)
+
+    def free(self):
+        while self.images:
+            self.images.pop().free()
+
 class Codec(object):
     def __init__(self, iface):
         self.iface = iface
@@ -114,6 +254,18 @@ class Codec(object):
                 vpx.vpx_codec_version_extra_str(),
                 vpx.vpx_codec_build_config())
 
+class LazyCodec(object):
+    "Create the codec interface on the first access of the class attribute"
+    def __init__(self, factory):
+        self.factory = factory
+        self.codec = None
+
+    def __get__(self, obj, cls=None):
+        if self.codec is None:
+            self.codec = Codec(getattr(vpx, self.factory)())
+
+        return self.codec
+
 class Context(object):
     def __init__(self, iface):
         self.iface = iface
@@ -145,19 +297,123 @@ class Packets(object):
         return self
 
     def next(self):
-        packet = vpx.vpx_codec_get_cx_data(self.codec, self.iter)
+        packet = vpx.vpx_codec_next_cx_data(self.codec, self.iter)
 
         if packet is None:
             raise StopIteration()
 
-        return packet.kind, vpx.vpx_pkt_get_data(packet)
+        return packet
+
+class Telemetry(object):
+    """Per frame encoder statistics, stored in typed arrays and readable in bulk as NumPy arrays.
+
+    The buffer level is modelled as a leaky bucket from the rc_buf_* config, in milliseconds.
+
+    The quantizer is read once per encode call, so it is -1 when the call emitted several
+    frames (eg. an alt-ref frame with the visible frame) and can't be attributed to one.
+    Dropped frames are only detected without lag (g_lag_in_frames == 0), a lagged encoder
+    never records a dropped row.
+    """
+    COLUMNS = [
+        ('pts', 'l'),
+        ('size', 'L'),
+        ('flags', 'L'),
+        ('dropped', 'B'),
+        ('quantizer', 'i'),
+        ('psnr', 'd'),
+        ('psnr_y', 'd'),
+        ('psnr_u', 'd'),
+        ('psnr_v', 'd'),
+        ('encode_time', 'd'),
+        ('buffer_level', 'd'),
+    ]
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.clear()
+
+    def __len__(self):
+        return len(self.pts)
+
+    def clear(self):
+        for name, typecode in self.COLUMNS:
+            setattr(self, name, array.array(typecode))
+
+        self.level = self.cfg.rc_buf_initial_sz
+        self.pending_psnr = None
+
+    def record(self, pts, size, flags, dropped, quantizer, encode_time, duration):
+        bitrate = self.cfg.rc_target_bitrate or 1
+        interval = 1000.0 * duration * self.cfg.g_timebase.num / self.cfg.g_timebase.den
+
+        self.level = min(self.level + interval - size * 8.0 / bitrate, self.cfg.rc_buf_sz)
+
+        self.pts.append(pts)
+        self.size.append(size)
+        self.flags.append(flags)
+        self.dropped.append(dropped)
+        self.quantizer.append(quantizer)
+        self.encode_time.append(encode_time)
+        self.buffer_level.append(self.level)
+
+        # the PSNR packet of a frame is emitted before its frame packet
+        psnr, self.pending_psnr = self.pending_psnr or (float('nan'),) * 4, None
+
+        for column, value in zip((self.psnr, self.psnr_y, self.psnr_u, self.psnr_v), psnr):
+            column.append(value)
+
+    def collect(self, encoder, pts, duration, encode_time):
+        "Drain and record the packets of an encode call, return an iterator of (kind, data)"
+        it = vpx.vpx_codec_iter_alloc()
+        quantizer = vpx.vpx_codec_control_get_int(encoder.codec, vpx.VP8E_GET_LAST_QUANTIZER_64)
+        received = []
+
+        while True:
+            packet = vpx.vpx_codec_next_cx_packet(encoder.codec, it)
+
+            if packet is None:
+                break
+
+            received.append(packet)
+
+        if len([packet for packet in received if packet[0] == vpx.VPX_CODEC_CX_FRAME_PKT]) > 1:
+            quantizer = -1
+
+        packets = []
+
+        for kind, data, frame_pts, flags in received:
+            if kind == vpx.VPX_CODEC_CX_FRAME_PKT:
+                self.record(frame_pts, len(data), flags, 0, quantizer, encode_time, duration)
+            elif kind == vpx.VPX_CODEC_PSNR_PKT:
+                self.pending_psnr = data
+
+            packets.append((kind, data))
+
+        if not packets and pts is not None and self.cfg.g_lag_in_frames == 0:
+            self.record(pts, 0, 0, 1, quantizer, encode_time, duration)
+
+        return iter(packets)
+
+    def as_arrays(self):
+        "Return the columns as a dict of NumPy arrays"
+        import numpy
+
+        arrays = {}
+
+        for name, typecode in self.COLUMNS:
+            column = getattr(self, name)
+
+            arrays[name] = numpy.frombuffer(column, typecode).copy() if len(column) else numpy.zeros(0, typecode)
+
+        return arrays
 
 class Encoder(Context):
-    Interface = Codec(vpx.vpx_codec_vp8_cx())
+    Interface = LazyCodec('vpx_codec_vp8_cx')
 
     def __init__(self, width, height, error_resilient=False, lag_in_frames=0,
-                 undershoot_pct=0, overshoot_pct=0):
-        Context.__init__(self, vpx.vpx_codec_vp8_cx())
+                 undershoot_pct=0, overshoot_pct=0, psnr=False, telemetry=False, resize_allowed=False,
+                 timebase=None):
+        Context.__init__(self, self.Interface.iface)
 
         self.cfg = vpx.vpx_codec_enc_cfg_t()
 
@@ -179,7 +435,19 @@ class Encoder(Context):
         if overshoot_pct > 0:
             self.cfg.g_overshoot_pct = overshoot_pct
 
-        VpxError.check(vpx.vpx_codec_enc_init_ver(self.codec, self.iface, self.cfg, 0, vpx.VPX_ENCODER_ABI_VERSION))
+        if resize_allowed:
+            self.cfg.rc_resize_allowed = 1
+
+        if timebase:
+            self.cfg.g_timebase.num, self.cfg.g_timebase.den = timebase
+
+        self.flags = vpx.VPX_CODEC_USE_PSNR if psnr else 0
+
+        VpxError.check(vpx.vpx_codec_enc_init_ver(self.codec, self.iface, self.cfg, self.flags, vpx.VPX_ENCODER_ABI_VERSION))
+
+        self.telemetry = Telemetry(self.cfg) if telemetry else None
+        self.drained = True
+        self.duration = 1
 
     @property
     def width(self):
@@ -197,15 +465,244 @@ class Encoder(Context):
     def config(self, cfg):
         self.cfg = cfg
 
+        if self.telemetry is not None:
+            self.telemetry.cfg = cfg
+
         VpxError.check(vpx.vpx_codec_enc_config_set(self.codec, self.cfg))
 
         return self.cfg
 
-    def encode(self, img, pts, duration=1, flags=0, deadline=vpx.VPX_DL_REALTIME):
-        VpxError.check(vpx.vpx_codec_encode(self.codec, img.img, pts, duration, flags, deadline));
+    def reconfigure(self, **fields):
+        """Update the config fields in place, eg. rc_target_bitrate=500, the encoder is only reconfigured if changed.
+
+        The fields are restored if the encoder rejects the new config.
+        """
+        for name in fields:
+            if not hasattr(self.cfg, name):
+                raise AttributeError("unknown config field '%s'" % name)
+
+        saved = dict((name, getattr(self.cfg, name)) for name, value in fields.items() if getattr(self.cfg, name) != value)
+
+        if not saved:
+            return False
+
+        try:
+            for name in saved:
+                setattr(self.cfg, name, fields[name])
+
+            VpxError.check(vpx.vpx_codec_enc_config_set(self.codec, self.cfg))
+        except Exception:
+            for name, value in saved.items():
+                setattr(self.cfg, name, value)
+
+            raise
+
+        return True
+
+    def set_bitrate(self, bitrate):
+        "Set the target bitrate in kbps"
+        return self.reconfigure(rc_target_bitrate=bitrate)
+
+    def set_quantizer(self, min_quantizer, max_quantizer):
+        "Set the quantizer range, from 0 to 63"
+        return self.reconfigure(rc_min_quantizer=min_quantizer, rc_max_quantizer=max_quantizer)
+
+    def set_keyframe_interval(self, max_dist, min_dist=None):
+        "Set the maximum (and minimum) distance between keyframes, in frames"
+        if min_dist is None:
+            return self.reconfigure(kf_max_dist=max_dist)
+
+        return self.reconfigure(kf_min_dist=min_dist, kf_max_dist=max_dist)
+
+    def set_frame_rate(self, num, den=1):
+        """Set the frame rate, as the default frame duration in units of the fixed time base.
+
+        The time base isn't changed, so the pts stay continuous, and should advance by
+        the frame duration. Use a fine time base (eg. timebase=(1, 90000)) for exact rates.
+        """
+        timebase = self.cfg.g_timebase
+        duration = max(1, int(round(float(timebase.den) * den / (timebase.num * num))))
+
+        if duration == self.duration:
+            return False
+
+        self.duration = duration
+
+        return True
+
+    def resize(self, width, height):
+        """Change the frame size, in place if the encoder accepts it.
+
+        Otherwise the context is destroyed and initialized again with the same config,
+        and the controls (eg. scale mode) must be set again. VP8 never resizes a lagged
+        encoder in place, so its lookahead must be drained with flush() first.
+        Return True if resized in place.
+        """
+        if (self.cfg.g_w, self.cfg.g_h) == (width, height):
+            return True
+
+        try:
+            self.reconfigure(g_w=width, g_h=height)
+
+            return True
+        except VpxError:
+            pass
+
+        if self.cfg.g_lag_in_frames > 1 and not self.drained:
+            raise ValueError("the lookahead must be drained with flush() before resizing")
+
+        saved = (self.cfg.g_w, self.cfg.g_h)
+
+        VpxError.check(vpx.vpx_codec_destroy(self.codec))
+
+        self.cfg.g_w = width
+        self.cfg.g_h = height
+
+        errno = vpx.vpx_codec_enc_init_ver(self.codec, self.iface, self.cfg, self.flags, vpx.VPX_ENCODER_ABI_VERSION)
+
+        if errno != vpx.VPX_CODEC_OK:
+            self.cfg.g_w, self.cfg.g_h = saved
+
+            VpxError.check(vpx.vpx_codec_enc_init_ver(self.codec, self.iface, self.cfg, self.flags, vpx.VPX_ENCODER_ABI_VERSION))
+
+            raise VpxError(errno)
+
+        return False
+
+    def control(self, ctrl_id, value):
+        "Set an integer control, eg. vpx.VP8E_SET_CPUUSED"
+        VpxError.check(vpx.vpx_codec_control_set_int(self.codec, ctrl_id, value))
+
+    def set_altref(self, enabled=True, max_frames=7, strength=3, filter_type=3):
+        "Enable the automatic alt-ref frames, temporally filtered over up to max_frames lookahead frames"
+        self.control(vpx.VP8E_SET_ENABLEAUTOALTREF, 1 if enabled else 0)
+
+        if enabled:
+            self.control(vpx.VP8E_SET_ARNR_MAXFRAMES, max_frames)
+            self.control(vpx.VP8E_SET_ARNR_STRENGTH, strength)
+            self.control(vpx.VP8E_SET_ARNR_TYPE, filter_type)
+
+    def set_scale_mode(self, h_scaling_mode, v_scaling_mode=None):
+        "Set the internal scaling mode, eg. vpx.VP8E_ONETWO to encode at half size"
+        if v_scaling_mode is None:
+            v_scaling_mode = h_scaling_mode
+
+        VpxError.check(vpx.vpx_codec_set_scale_mode(self.codec, h_scaling_mode, v_scaling_mode))
+
+    def encode(self, img, pts, duration=None, flags=0, deadline=None):
+        if duration is None:
+            duration = self.duration
+
+        if deadline is None:
+            deadline = vpx.VPX_DL_REALTIME
+
+        start = time.time()
+
+        VpxError.check(vpx.vpx_codec_encode(self.codec, img.img if img else None, pts, duration, flags, deadline));
+
+        if img:
+            self.drained = False
+
+        if self.telemetry is not None:
+            return self.telemetry.collect(self, pts if img else None, duration, time.time() - start)
 
         return Packets(self.codec)
 
+    def flush(self, deadline=None):
+        "Drain the frames held in the lookahead at the end of stream"
+        while True:
+            drained = False
+
+            for packet in self.encode(None, 0, deadline=deadline):
+                drained = True
+
+                yield packet
+
+            if not drained:
+                break
+
+        self.drained = True
+
+class Lookahead(object):
+    """Encode with lag_in_frames and alt-ref frames within a memory budget.
+
+    The input frames are acquired from an image pool, and returned to the pool as soon as
+    libvpx has copied them into its own lookahead buffers, so the caller could reuse them
+    after push returns, and never holds more than the given number of frames.
+    """
+    def __init__(self, width, height, lag_in_frames=16, frames=1, memory=None, altref=True,
+                 arnr_max_frames=7, arnr_strength=3, arnr_type=3, **kwds):
+        reserved = 2 if altref else 1
+
+        if memory:
+            lag_in_frames = min(lag_in_frames, (memory - frames * Lookahead.image_size(width, height)) //
+                                               Lookahead.buffer_size(width, height) - reserved)
+
+            if lag_in_frames < 0:
+                raise ValueError("the memory budget is too small")
+
+        self.encoder = Encoder(width, height, lag_in_frames=lag_in_frames, **kwds)
+
+        if altref and lag_in_frames > 0:
+            self.encoder.set_altref(True, min(arnr_max_frames, lag_in_frames), arnr_strength, arnr_type)
+
+        self.pool = ImagePool(width, height)
+        self.frames = frames
+        self.owned = set()
+        self.memory = frames * Lookahead.image_size(width, height) + \
+                      (lag_in_frames + reserved) * Lookahead.buffer_size(width, height)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def image_size(width, height):
+        "The size of an I420 input frame"
+        return ((width + 1) & ~1) * ((height + 1) & ~1) * 3 // 2
+
+    @staticmethod
+    def buffer_size(width, height):
+        "The size of an encoder frame buffer, aligned to macroblocks with a 32 pixels border"
+        return (((width + 15) & ~15) + 64) * (((height + 15) & ~15) + 64) * 3 // 2
+
+    @property
+    def lag_in_frames(self):
+        return self.encoder.cfg.g_lag_in_frames
+
+    def acquire(self):
+        if len(self.owned) >= self.frames:
+            raise ValueError("all the frames are in use")
+
+        img = self.pool.acquire()
+
+        self.owned.add(img)
+
+        return img
+
+    def release(self, img):
+        self.owned.remove(img)
+        self.pool.release(img)
+
+    def push(self, img, pts, duration=None, flags=0, deadline=None):
+        "Encode a frame acquired from the lookahead, the frame is released when it returns"
+        if img not in self.owned:
+            raise ValueError("the frame was not acquired from the lookahead")
+
+        try:
+            return self.encoder.encode(img, pts, duration, flags, deadline)
+        finally:
+            self.release(img)
+
+    def flush(self, deadline=None):
+        return self.encoder.flush(deadline)
+
+    def close(self):
+        self.encoder.close()
+        self.pool.free()
+
 class Frames(object):
     def __init__(self, codec):
         self.codec = codec
@@ -223,10 +720,10 @@ class Frames(object):
         return Image(img=img)
 
 class Decoder(Context):
-    Interface = Codec(vpx.vpx_codec_vp8_dx())
+    Interface = LazyCodec('vpx_codec_vp8_dx')
 
     def __init__(self, flags=0):
-        Context.__init__(self, vpx.vpx_codec_vp8_dx())
+        Context.__init__(self, self.Interface.iface)
 
         VpxError.check(vpx.vpx_codec_dec_init_ver(self.codec, self.iface, None, flags, vpx.VPX_DECODER_ABI_VERSION))
 
@@ -235,6 +732,20 @@ class Decoder(Context):
 
         return Frames(self.codec)
 
+    def decode_keyframes(self, packets, every=1, deadline=0):
+        "Decode every Nth keyframe, the other packets are skipped by checking the frame tag"
+        keyframes = 0
+
+        for data in packets:
+            if not Decoder.is_keyframe(data):
+                continue
+
+            keyframes += 1
+
+            if (keyframes - 1) % every == 0:
+                for img in self.decode(data, deadline):
+                    yield img
+
     def register_frame_callback(self, callback):
         "void callback(const vpx_image_t *img)"
         VpxError.check(vpx.vpx_codec_register_frame_callback(self.codec, callback))
@@ -250,14 +761,284 @@ class Decoder(Context):
 
         return info
 
+    @staticmethod
+    def is_keyframe(data):
+        "Check the frame type bit of the VP8 frame tag, without parsing the rest of the header"
+        return len(data) >= 10 and not (ord(data[0]) & 1)
+
     @staticmethod
     def peek_stream_info(data):
         info = vpx.vpx_codec_stream_info_alloc()
 
-        VpxError.check(vpx.vpx_codec_peek_stream_info(vpx.vpx_codec_vp8_dx(), data, info))
+        VpxError.check(vpx.vpx_codec_peek_stream_info(Decoder.Interface.iface, data, info))
 
         return info
 
+class Thumbnailer(object):
+    "Generate RGB24 thumbnails from the keyframes of VP8 clips"
+    def __init__(self, width, height=None, every=1, filter=None):
+        self.width = width
+        self.height = height
+        self.every = every
+        self.filter = filter
+
+    def thumbnails(self, packets):
+        pool = None
+
+        with Decoder() as decoder:
+            try:
+                for img in decoder.decode_keyframes(packets, self.every):
+                    if pool is None:
+                        pool = ImagePool(self.width, self.height or (self.width * img.height // img.width + 1) & ~1)
+
+                    yield img.thumbnail(pool.width, pool.height, self.filter, pool)
+            finally:
+                if pool is not None:
+                    pool.free()
+
+    def batch(self, clips):
+        return [list(self.thumbnails(packets)) for packets in clips]
+
+class SharedFrames(object):
+    """A ring of frame slots in a shared memory map, each slot holds a raw frame and its compressed packets.
+
+    The images wrap the slots without copying, so the worker processes forked after
+    the map is created could encode or decode in place, and only pass the slot index.
+    An anonymous map is only shared with forked processes, a map backed by a path could
+    also be attached by other processes opening the same path with the same geometry.
+    The images and packet views are invalid after the frames are closed.
+    """
+    def __init__(self, width, height, slots, fmt=None, packet_size=None, path=None):
+        self.width = width
+        self.height = height
+        self.slots = slots
+        self.fmt = vpx.VPX_IMG_FMT_I420 if fmt is None else fmt
+
+        with Image(width, height, self.fmt) as probe:
+            self.frame_size = vpx.vpx_img_get_size(probe.img)
+
+        self.packet_size = packet_size or self.frame_size
+        self.slot_size = self.frame_size + self.packet_size
+
+        size = self.slot_size * slots
+
+        if path:
+            import os.path
+
+            if os.path.exists(path):
+                if os.path.getsize(path) < size:
+                    raise ValueError("the file is too small for the frames")
+
+                mode = 'r+b'
+            else:
+                mode = 'w+b'
+
+            with open(path, mode) as f:
+                if mode == 'w+b':
+                    f.truncate(size)
+
+                self.mm = mmap.mmap(f.fileno(), size)
+        else:
+            self.mm = mmap.mmap(-1, size)
+
+        self.images = [Image(width, height, self.fmt, data=buffer(self.mm, slot * self.slot_size, self.frame_size))
+                       for slot in range(slots)]
+        self.workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.slots
+
+    def image(self, slot):
+        return self.images[slot]
+
+    def packet(self, slot, offset, size):
+        "Return a read only view of the packet stored in the slot"
+        return buffer(self.mm, slot * self.slot_size + self.frame_size + offset, size)
+
+    def write_packet(self, slot, offset, data):
+        if offset + len(data) > self.packet_size:
+            raise ValueError("the packet is too large for the slot")
+
+        self.mm.seek(slot * self.slot_size + self.frame_size + offset)
+        self.mm.write(data)
+
+        return len(data)
+
+    def close(self):
+        if self.workers:
+            raise ValueError("the frames are still attached to %d worker processes" % len(self.workers))
+
+        while self.images:
+            self.images.pop().free()
+
+        self.mm.close()
+
+class WorkerProcess(object):
+    "Run a codec in a worker process, the requests and results only carry the slot indexes"
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, frames):
+        import multiprocessing
+
+        self.frames = frames
+        self.requests = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=self.serve)
+        self.process.daemon = True
+        self.process.start()
+
+        frames.workers.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def failure(e):
+        "Return the exception if it could be sent back to the parent, or a RuntimeError describing it"
+        import pickle
+
+        try:
+            pickle.loads(pickle.dumps(e, pickle.HIGHEST_PROTOCOL))
+
+            return e
+        except Exception:
+            return RuntimeError("%s: %s" % (e.__class__.__name__, e))
+
+    def serve(self):
+        try:
+            codec = self.open()
+        except Exception as e:
+            self.results.put((None, None, self.failure(e)))
+            return
+
+        try:
+            for request in iter(self.requests.get, None):
+                try:
+                    self.results.put((request[0], self.handle(codec, *request), None))
+                except Exception as e:
+                    self.results.put((request[0], None, self.failure(e)))
+        finally:
+            codec.close()
+
+    def result(self):
+        try:
+            from Queue import Empty
+        except ImportError:
+            from queue import Empty
+
+        while True:
+            try:
+                slot, result, error = self.results.get(timeout=self.POLL_INTERVAL)
+                break
+            except Empty:
+                if not self.process.is_alive():
+                    try:
+                        slot, result, error = self.results.get_nowait()
+                        break
+                    except Empty:
+                        raise RuntimeError("the worker process exited with code %s" % self.process.exitcode)
+
+        if error is not None:
+            raise error
+
+        return slot, result
+
+    def close(self):
+        if self.process.is_alive():
+            self.requests.put(None)
+            self.process.join()
+
+        if self in self.frames.workers:
+            self.frames.workers.remove(self)
+
+class EncoderProcess(WorkerProcess):
+    """Encode the frame slots in a worker process.
+
+    The packets are written to the packet area of the same slot, and returned as views of the map,
+    which are valid until the slot is submitted again.
+    """
+    def __init__(self, frames, *args, **kwds):
+        self.args = (frames.width, frames.height) + args
+        self.kwds = kwds
+
+        WorkerProcess.__init__(self, frames)
+
+    def open(self):
+        return Encoder(*self.args, **self.kwds)
+
+    def handle(self, encoder, slot, pts, duration, flags, deadline):
+        offset = 0
+        packets = []
+
+        for kind, data in encoder.encode(self.frames.image(slot), pts, duration, flags, deadline):
+            if kind == vpx.VPX_CODEC_PSNR_PKT:
+                # the PSNR values are sent back through the result queue
+                packets.append((kind, None, data))
+                continue
+
+            size = self.frames.write_packet(slot, offset, data)
+
+            packets.append((kind, offset, size))
+
+            offset += size
+
+        return packets
+
+    def submit(self, slot, pts, duration=None, flags=0, deadline=None):
+        self.requests.put((slot, pts, duration, flags, deadline))
+
+    def result(self):
+        slot, packets = WorkerProcess.result(self)
+        results = []
+
+        for kind, offset, data in packets:
+            if offset is not None:
+                data = self.frames.packet(slot, offset, data)
+
+            results.append((kind, data))
+
+        return slot, results
+
+class DecoderProcess(WorkerProcess):
+    """Decode the packets of the frame slots in a worker process.
+
+    The decoded frame is stored in the frame area of the same slot, scaled if the sizes differ.
+    """
+    def __init__(self, frames, flags=0):
+        self.flags = flags
+
+        WorkerProcess.__init__(self, frames)
+
+    def open(self):
+        return Decoder(self.flags)
+
+    def handle(self, decoder, slot, size, deadline):
+        decoded = False
+
+        for img in decoder.decode(self.frames.packet(slot, 0, size), deadline):
+            img.scaleTo(self.frames.image(slot))
+
+            decoded = True
+
+        return decoded
+
+    def submit(self, slot, data=None, size=None, deadline=0):
+        "Decode the packet in the slot, the data is copied to the slot first if given"
+        if data is not None:
+            size = self.frames.write_packet(slot, 0, data)
+
+        self.requests.put((slot, size, deadline))
+
+    def result(self):
+        slot, decoded = WorkerProcess.result(self)
 
-        
-    
\ No newline at end of file
+        return slot, self.frames.image(slot) if decoded else None
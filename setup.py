@@ -46,6 +46,7 @@ else:
 
 vpx = Extension(name = '_vpx',
                 sources = ['vpx.i'],
+                swig_opts = ['-O'],
                 include_dirs = [vpx_inc_path] if vpx_inc_path else [],
                 library_dirs = [vpx_lib_path] if vpx_lib_path else [],
                 libraries = [vpx_lib] if vpx_lib else [],
@@ -1,4 +1,6 @@
 from pyvpx import *
+import sys, os, os.path
+import subprocess
 import unittest
 
 __author__ = 'Flier Lu'
@@ -29,6 +31,79 @@ class TestImage(unittest.TestCase):
         self.assertEquals(320, img.width)
         self.assertEquals(200, img.height)
 
+    def testScale(self):
+        src = Image(320, 240)
+        src.clear()
+
+        for filter in [vpx.VPX_SCALE_NEAREST, vpx.VPX_SCALE_BILINEAR, vpx.VPX_SCALE_BOX]:
+            img = src.scaleTo(160, 120, filter=filter)
+
+            self.assertEquals(vpx.VPX_IMG_FMT_I420, img.format)
+            self.assertEquals(160, img.width)
+            self.assertEquals(120, img.height)
+            self.assertEquals(chr(0) * len(img.data), str(img.data))
+
+        dst = Image(640, 480)
+
+        self.assertEquals(dst, src.scaleTo(dst, threads=4))
+        self.assertEquals(chr(0) * len(dst.data), str(dst.data))
+
+        self.assertRaises(ValueError, src.scaleTo, Image(160, 120, vpx.VPX_IMG_FMT_RGB24))
+        self.assertRaises(ValueError, src.scaleTo, Image(160, 120, vpx.VPX_IMG_FMT_RGB24), threads=4)
+        self.assertRaises(ValueError, src.scaleTo, 160, 120, filter=99, threads=4)
+
+    def testScaleGradient(self):
+        src = Image(320, 240)
+        src.data[:] = ''.join(chr((i * 7 + i // 320) % 251) for i in range(len(src.data)))
+
+        for filter in [vpx.VPX_SCALE_NEAREST, vpx.VPX_SCALE_BILINEAR, vpx.VPX_SCALE_BOX]:
+            for width, height in [(160, 120), (161, 121), (640, 479)]:
+                single = Image(width, height)
+                single.clear()
+
+                threaded = Image(width, height)
+                threaded.clear()
+
+                src.scaleTo(single, filter=filter)
+                src.scaleTo(threaded, filter=filter, threads=4)
+
+                self.assertNotEquals(chr(0) * len(single.data), str(single.data))
+                self.assertEquals(str(single.data), str(threaded.data))
+
+    def testScaleBox(self):
+        src = Image(2, 2)
+        src.data[:] = ''.join(map(chr, [10, 20, 30, 40, 50, 60]))
+
+        dst = src.scaleTo(1, 1, filter=vpx.VPX_SCALE_BOX)
+
+        data = str(dst.data)
+
+        self.assertEquals(25, ord(data[0]))
+        self.assertEquals(50, ord(data[4]))
+        self.assertEquals(60, ord(data[5]))
+
+    def testImagePool(self):
+        with ImagePool(160, 120) as pool:
+            src = Image(320, 240)
+            src.clear()
+
+            img = src.scaleTo(pool)
+
+            self.assertEquals(160, img.width)
+            self.assertEquals(120, img.height)
+            self.assertEquals(0, len(pool))
+
+            pool.release(img)
+
+            self.assertEquals(1, len(pool))
+            self.assert_(img is pool.acquire())
+
+            self.assertRaises(ValueError, pool.release, src)
+
+        with ImagePool(160, 120, vpx.VPX_IMG_FMT_RGB24) as pool:
+            self.assertRaises(ValueError, src.scaleTo, pool)
+            self.assertEquals(1, len(pool))
+
 class TestCodec(unittest.TestCase):
     def testVersion(self):
         major, minor, patch, version, extra, build_config = Codec.version()
@@ -43,6 +118,22 @@ class TestCodec(unittest.TestCase):
         self.assertEquals(vpx.VPX_CODEC_CAP_DECODER, Decoder.Interface.caps & vpx.VPX_CODEC_CAP_DECODER)
         self.assert_(Decoder.Interface.name.startswith('WebM Project VP8 Decoder'))
 
+    def testLazyLoading(self):
+        self.assert_(Encoder.Interface is Encoder.Interface)
+        self.assert_(Decoder.Interface is Decoder.Interface)
+
+        mod = LazyModule('vpx')
+
+        self.assertEquals(vpx.VPX_CODEC_OK, mod.VPX_CODEC_OK)
+        self.assertEquals(vpx.vpx_codec_version(), mod.vpx_codec_version())
+
+    def testLazyImport(self):
+        code = "import sys, pyvpx; assert 'vpx' not in sys.modules; " \
+               "pyvpx.Encoder.Interface; assert 'vpx' in sys.modules"
+
+        self.assertEquals(0, subprocess.call([sys.executable, '-c', code],
+                                             cwd=os.path.dirname(os.path.abspath(__file__))))
+
     def testException(self):
         err = VpxError(vpx.VPX_CODEC_OK)
 
@@ -66,6 +157,178 @@ class TestEncoder(unittest.TestCase):
 
             self.assertRaises(StopIteration, packets.next)
 
+    def testScaleMode(self):
+        with Encoder(320, 240) as encoder:
+            encoder.set_scale_mode(vpx.VP8E_ONETWO)
+
+            with Image(320, 240) as img:
+                img.clear()
+
+                kind, data = encoder.encode(img, 1, flags=vpx.VPX_EFLAG_FORCE_KF).next()
+
+            self.assertEquals(vpx.VPX_CODEC_CX_FRAME_PKT, kind)
+            self.assert_(len(data) > 0)
+
+    def testResizeLagged(self):
+        with Encoder(320, 240, lag_in_frames=8) as encoder:
+            with Image(320, 240) as img:
+                img.clear()
+
+                list(encoder.encode(img, 1))
+
+            self.assertRaises(ValueError, encoder.resize, 160, 120)
+            self.assertEquals(320, encoder.width)
+            self.assertEquals(240, encoder.height)
+
+            self.assert_(len(list(encoder.flush())) > 0)
+
+            self.assertFalse(encoder.resize(160, 120))
+            self.assertEquals(160, encoder.width)
+            self.assertEquals(120, encoder.height)
+
+    def testTelemetry(self):
+        with Encoder(320, 240, psnr=True, telemetry=True) as encoder:
+            with Image(320, 240) as img:
+                img.clear()
+
+                for pts in range(1, 4):
+                    kinds = [kind for kind, data in encoder.encode(img, pts, flags=vpx.VPX_EFLAG_FORCE_KF if pts == 1 else 0)]
+
+                    self.assert_(vpx.VPX_CODEC_PSNR_PKT in kinds)
+
+            telemetry = encoder.telemetry
+
+            self.assertEquals(3, len(telemetry))
+            self.assertEquals([1, 2, 3], list(telemetry.pts))
+            self.assertEquals(vpx.VPX_FRAME_IS_KEY, telemetry.flags[0] & vpx.VPX_FRAME_IS_KEY)
+            self.assertEquals([0, 0, 0], list(telemetry.dropped))
+            self.assert_(all(size > 0 for size in telemetry.size))
+            self.assert_(all(0 <= q <= 63 for q in telemetry.quantizer))
+            self.assert_(all(psnr > 0 for psnr in telemetry.psnr))
+            self.assert_(all(psnr > 0 for psnr in telemetry.psnr_y))
+
+            try:
+                import numpy
+            except ImportError:
+                return
+
+            arrays = telemetry.as_arrays()
+
+            self.assertEquals(3, len(arrays['size']))
+            self.assertEquals(telemetry.size[1], arrays['size'][1])
+
+    def testTelemetryLagged(self):
+        with Lookahead(320, 240, lag_in_frames=8, telemetry=True) as lookahead:
+            for pts in range(1, 13):
+                img = lookahead.acquire()
+                img.clear()
+
+                list(lookahead.push(img, pts))
+
+            list(lookahead.flush())
+
+            telemetry = lookahead.encoder.telemetry
+
+            self.assert_(len(telemetry) >= 12)
+            self.assertEquals(0, sum(telemetry.dropped))
+            self.assert_(all(q == -1 or 0 <= q <= 63 for q in telemetry.quantizer))
+
+    def testReconfigure(self):
+        with Encoder(320, 240) as encoder:
+            encoder.set_bitrate(100)
+            encoder.set_quantizer(4, 48)
+            encoder.set_keyframe_interval(60, 0)
+
+            self.assertEquals(100, encoder.config.rc_target_bitrate)
+            self.assertEquals(4, encoder.config.rc_min_quantizer)
+            self.assertEquals(48, encoder.config.rc_max_quantizer)
+            self.assertEquals(60, encoder.config.kf_max_dist)
+
+            self.assertFalse(encoder.reconfigure(rc_target_bitrate=100))
+            self.assert_(encoder.reconfigure(rc_target_bitrate=200))
+
+            self.assertRaises(VpxError, encoder.reconfigure, rc_max_quantizer=99)
+            self.assertEquals(48, encoder.config.rc_max_quantizer)
+
+            self.assertRaises(AttributeError, encoder.reconfigure, rc_target_bitrate=500, unknown_field=1)
+            self.assertEquals(200, encoder.config.rc_target_bitrate)
+
+            self.assertFalse(encoder.set_bitrate(200))
+            self.assert_(encoder.set_bitrate(300))
+            self.assertEquals(300, encoder.config.rc_target_bitrate)
+            self.assert_(encoder.set_quantizer(2, 40))
+
+    def testFrameRate(self):
+        with Encoder(320, 240, telemetry=True, timebase=(1, 30)) as encoder:
+            with Image(320, 240) as img:
+                img.clear()
+
+                for pts in [0, 1, 2]:
+                    self.assert_(list(encoder.encode(img, pts, flags=vpx.VPX_EFLAG_FORCE_KF if pts == 0 else 0)))
+
+                self.assert_(encoder.set_frame_rate(15))
+                self.assertFalse(encoder.set_frame_rate(15))
+                self.assertEquals(2, encoder.duration)
+
+                for pts in [3, 5, 7]:
+                    self.assert_(list(encoder.encode(img, pts)))
+
+            self.assertEquals(1, encoder.config.g_timebase.num)
+            self.assertEquals(30, encoder.config.g_timebase.den)
+            self.assertEquals([0, 1, 2, 3, 5, 7], list(encoder.telemetry.pts))
+            self.assertEquals(0, sum(encoder.telemetry.dropped))
+
+            with Image(320, 240) as img:
+                img.clear()
+
+                kind, data = encoder.encode(img, 1, flags=vpx.VPX_EFLAG_FORCE_KF).next()
+
+            encoder.resize(160, 120)
+
+            self.assertEquals(160, encoder.width)
+            self.assertEquals(120, encoder.height)
+
+            with Image(160, 120) as img:
+                img.clear()
+
+                kind, data = encoder.encode(img, 2, flags=vpx.VPX_EFLAG_FORCE_KF).next()
+
+            info = Decoder.peek_stream_info(data)
+
+            self.assertEquals(160, info.w)
+            self.assertEquals(120, info.h)
+
+    def testLookahead(self):
+        with Lookahead(320, 240, lag_in_frames=8) as lookahead:
+            self.assertEquals(8, lookahead.lag_in_frames)
+
+            frames = 0
+
+            for pts in range(1, 11):
+                img = lookahead.acquire()
+                img.clear()
+
+                self.assertRaises(ValueError, lookahead.acquire)
+
+                frames += len([kind for kind, data in lookahead.push(img, pts) if kind == vpx.VPX_CODEC_CX_FRAME_PKT])
+
+                self.assertRaises(ValueError, lookahead.push, img, pts)
+
+            self.assert_(frames < 10)
+
+            frames += len([kind for kind, data in lookahead.flush() if kind == vpx.VPX_CODEC_CX_FRAME_PKT])
+
+            self.assert_(frames >= 10)
+
+    def testLookaheadMemory(self):
+        memory = 4 * Lookahead.image_size(320, 240) + 6 * Lookahead.buffer_size(320, 240)
+
+        with Lookahead(320, 240, lag_in_frames=25, frames=4, memory=memory) as lookahead:
+            self.assertEquals(4, lookahead.lag_in_frames)
+            self.assertEquals(memory, lookahead.memory)
+
+        self.assertRaises(ValueError, Lookahead, 320, 240, memory=Lookahead.image_size(320, 240))
+
 class TestDecode(unittest.TestCase):
     def testDecode(self):
         with Encoder(320, 240) as encoder:
@@ -125,5 +388,145 @@ class TestDecode(unittest.TestCase):
                     self.assert_(frame_called)
                     self.assert_(slice_called)
 
+    def testThumbnails(self):
+        packets = []
+
+        with Encoder(320, 240) as encoder:
+            with Image(320, 240) as img:
+                img.clear()
+
+                for pts in range(1, 7):
+                    flags = vpx.VPX_EFLAG_FORCE_KF if pts % 3 == 1 else 0
+
+                    for kind, data in encoder.encode(img, pts, flags=flags):
+                        packets.append(str(data))
+
+        self.assertEquals([True, False, False, True, False, False], map(Decoder.is_keyframe, packets))
+
+        with Decoder() as decoder:
+            self.assertEquals(2, len(list(decoder.decode_keyframes(packets))))
+
+        with Decoder() as decoder:
+            self.assertEquals(1, len(list(decoder.decode_keyframes(packets[1:]))))
+
+        self.assertEquals(1, len(list(Thumbnailer(80).thumbnails(packets[1:]))))
+
+        thumbs = Thumbnailer(80).thumbnails(packets)
+
+        img = thumbs.next()
+
+        self.assertEquals(vpx.VPX_IMG_FMT_RGB24, img.format)
+        self.assertEquals(80, img.width)
+        self.assertEquals(60, img.height)
+
+        self.assert_(thumbs.next())
+        self.assertRaises(StopIteration, thumbs.next)
+
+        clips = Thumbnailer(80, 60, every=2).batch([packets, packets[:3]])
+
+        self.assertEquals([1, 1], map(len, clips))
+
+class TestShared(unittest.TestCase):
+    def testSharedFrames(self):
+        with SharedFrames(320, 240, 2) as frames:
+            self.assertEquals(2, len(frames))
+            self.assertEquals(115200, frames.frame_size)
+
+            img = frames.image(1)
+
+            self.assertEquals(320, img.width)
+            self.assertEquals(240, img.height)
+            self.assertEquals(frames.frame_size, len(img.data))
+
+            self.assertEquals(3, frames.write_packet(1, 0, "abc"))
+            self.assertEquals("abc", str(frames.packet(1, 0, 3)))
+
+            self.assertRaises(ValueError, frames.write_packet, 0, frames.packet_size - 1, "abc")
+
+        with SharedFrames(320, 240, 1, vpx.VPX_IMG_FMT_RGB24) as frames:
+            self.assertEquals(230400, frames.frame_size)
+            self.assertEquals(vpx.VPX_IMG_FMT_RGB24, frames.image(0).format)
+
+    def testSharedFile(self):
+        import shutil, tempfile
+
+        tmpdir = tempfile.mkdtemp()
+
+        try:
+            path = os.path.join(tmpdir, 'frames')
+
+            with SharedFrames(320, 240, 2, path=path) as frames:
+                frames.write_packet(1, 0, "abc")
+
+                with SharedFrames(320, 240, 2, path=path) as attached:
+                    self.assertEquals("abc", str(attached.packet(1, 0, 3)))
+
+            self.assertRaises(ValueError, SharedFrames, 320, 240, 4, path=path)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def testWorkerErrors(self):
+        with SharedFrames(320, 240, 2) as frames:
+            with EncoderProcess(frames) as encoder:
+                self.assertRaises(ValueError, frames.close)
+
+                encoder.submit(2, 1)
+
+                self.assertRaises(IndexError, encoder.result)
+
+                frames.image(0).clear()
+
+                encoder.submit(0, 1, flags=vpx.VPX_EFLAG_FORCE_KF)
+
+                slot, packets = encoder.result()
+
+                self.assertEquals(0, slot)
+
+            with EncoderProcess(frames, unknown_option=True) as encoder:
+                self.assertRaises(TypeError, encoder.result)
+
+                encoder.submit(0, 1)
+
+                self.assertRaises(RuntimeError, encoder.result)
+
+    def testTranscode(self):
+        with SharedFrames(320, 240, 2) as frames:
+            frames.image(0).clear()
+
+            with EncoderProcess(frames) as encoder:
+                encoder.submit(0, 1, flags=vpx.VPX_EFLAG_FORCE_KF)
+
+                slot, packets = encoder.result()
+
+            self.assertEquals(0, slot)
+            self.assertEquals(1, len(packets))
+
+            kind, data = packets[0]
+
+            self.assertEquals(vpx.VPX_CODEC_CX_FRAME_PKT, kind)
+            self.assertEquals(1, Decoder.peek_stream_info(data).is_kf)
+
+            with EncoderProcess(frames, psnr=True) as encoder:
+                encoder.submit(1, 1, flags=vpx.VPX_EFLAG_FORCE_KF)
+
+                slot, packets = encoder.result()
+
+            self.assertEquals(1, slot)
+
+            kinds = dict(packets)
+
+            self.assertEquals(4, len(kinds[vpx.VPX_CODEC_PSNR_PKT]))
+            self.assert_(Decoder.is_keyframe(kinds[vpx.VPX_CODEC_CX_FRAME_PKT]))
+
+            with DecoderProcess(frames) as decoder:
+                decoder.submit(1, data)
+
+                slot, img = decoder.result()
+
+            self.assertEquals(1, slot)
+            self.assert_(img is frames.image(1))
+            self.assertEquals(320, img.width)
+            self.assertEquals(240, img.height)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
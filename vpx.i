@@ -251,6 +251,235 @@ void vpx_img_convert_to(vpx_image_t *src, vpx_image_t *dst)
 
 %}
 
+////
+// I420/YV12 Scaling
+//
+// Each plane is scaled row by row into the destination, the source columns
+// are resolved once per call through lookup tables, so the inner loops only
+// walk the source and destination rows sequentially.
+//
+%inline%{
+
+/*!\brief List of supported scaling filters */
+enum vpx_img_scale_filter
+{
+    VPX_SCALE_NEAREST,  /**< nearest neighbour, fastest */
+    VPX_SCALE_BILINEAR, /**< bilinear interpolation */
+    VPX_SCALE_BOX       /**< box filter (area average), best for downscaling */
+};
+
+%}
+
+%{
+
+static int vpx_plane_scale(const unsigned char *src, int src_stride, int src_w, int src_h,
+                           unsigned char *dst, int dst_stride, int dst_w, int dst_h,
+                           int filter, int row_begin, int row_end)
+{
+    int x, y, i, j, y0, y1, wy, a, b, count;
+    long long f;
+    int *xs0, *xs1, *wx, *acc;
+    const unsigned char *s, *s0, *s1;
+    unsigned char *d;
+
+    if (src_w == dst_w && src_h == dst_h)
+    {
+        for (y = row_begin; y < row_end; y++)
+        {
+            memcpy(dst + y * dst_stride, src + y * src_stride, dst_w);
+        }
+
+        return 1;
+    }
+
+    xs0 = (int *) malloc(sizeof(int) * dst_w * 4);
+
+    if (xs0 == NULL)
+    {
+        return 0;
+    }
+
+    xs1 = xs0 + dst_w;
+    wx = xs1 + dst_w;
+    acc = wx + dst_w;
+
+    switch (filter)
+    {
+    case VPX_SCALE_NEAREST:
+        for (x = 0; x < dst_w; x++)
+        {
+            xs0[x] = (int) (((long long) (2 * x + 1) * src_w) / (2 * dst_w));
+        }
+
+        for (y = row_begin; y < row_end; y++)
+        {
+            s = src + (int) (((long long) (2 * y + 1) * src_h) / (2 * dst_h)) * src_stride;
+            d = dst + y * dst_stride;
+
+            for (x = 0; x < dst_w; x++)
+            {
+                d[x] = s[xs0[x]];
+            }
+        }
+        break;
+
+    case VPX_SCALE_BILINEAR:
+        for (x = 0; x < dst_w; x++)
+        {
+            f = max(((long long) (2 * x + 1) * src_w * 256) / (2 * dst_w) - 128, 0LL);
+
+            xs0[x] = min((int) (f >> 8), src_w - 1);
+            xs1[x] = min(xs0[x] + 1, src_w - 1);
+            wx[x] = (int) (f & 0xff);
+        }
+
+        for (y = row_begin; y < row_end; y++)
+        {
+            f = max(((long long) (2 * y + 1) * src_h * 256) / (2 * dst_h) - 128, 0LL);
+
+            y0 = min((int) (f >> 8), src_h - 1);
+            wy = (int) (f & 0xff);
+
+            s0 = src + y0 * src_stride;
+            s1 = y0 + 1 < src_h ? s0 + src_stride : s0;
+            d = dst + y * dst_stride;
+
+            for (x = 0; x < dst_w; x++)
+            {
+                a = s0[xs0[x]] * (256 - wx[x]) + s0[xs1[x]] * wx[x];
+                b = s1[xs0[x]] * (256 - wx[x]) + s1[xs1[x]] * wx[x];
+
+                d[x] = (unsigned char) ((a * (256 - wy) + b * wy + 32768) >> 16);
+            }
+        }
+        break;
+
+    case VPX_SCALE_BOX:
+        for (x = 0; x < dst_w; x++)
+        {
+            xs0[x] = (int) (((long long) x * src_w) / dst_w);
+            xs1[x] = max(xs0[x] + 1, (int) (((long long) (x + 1) * src_w) / dst_w));
+        }
+
+        for (y = row_begin; y < row_end; y++)
+        {
+            y0 = (int) (((long long) y * src_h) / dst_h);
+            y1 = max(y0 + 1, (int) (((long long) (y + 1) * src_h) / dst_h));
+
+            memset(acc, 0, sizeof(int) * dst_w);
+
+            for (j = y0; j < y1; j++)
+            {
+                s = src + j * src_stride;
+
+                for (x = 0; x < dst_w; x++)
+                {
+                    for (i = xs0[x]; i < xs1[x]; i++)
+                    {
+                        acc[x] += s[i];
+                    }
+                }
+            }
+
+            d = dst + y * dst_stride;
+
+            for (x = 0; x < dst_w; x++)
+            {
+                count = (y1 - y0) * (xs1[x] - xs0[x]);
+
+                d[x] = (unsigned char) ((acc[x] + count / 2) / count);
+            }
+        }
+        break;
+    }
+
+    free(xs0);
+
+    return 1;
+}
+
+%}
+
+%exception vpx_img_scale_rows
+{
+    $action
+
+    if (PyErr_Occurred()) SWIG_fail;
+}
+
+%exception vpx_img_scale_to
+{
+    $action
+
+    if (PyErr_Occurred()) SWIG_fail;
+}
+
+%feature("docstring", "Scale a band of destination rows from the source image") vpx_img_scale_rows;
+%feature("docstring", "Scale the source image to the size of the destination image") vpx_img_scale_to;
+
+%inline%{
+
+int vpx_img_scale_rows(vpx_image_t *src, vpx_image_t *dst, int filter, int row_begin, int row_end)
+{
+    int plane, ok = 1;
+    int sw, sh, dw, dh, xs, ys, band_begin, band_end;
+
+    if (src->fmt != dst->fmt || !(src->fmt & VPX_IMG_FMT_PLANAR) || (src->fmt & VPX_IMG_FMT_HAS_ALPHA))
+    {
+        PyErr_SetString(PyExc_ValueError,"the source and destination image should be same planar YUV format");
+        return 0;
+    }
+
+    if (filter < VPX_SCALE_NEAREST || filter > VPX_SCALE_BOX)
+    {
+        PyErr_SetString(PyExc_ValueError,"unsupported scaling filter");
+        return 0;
+    }
+
+    if (row_begin < 0 || row_end > (int) dst->d_h || row_begin > row_end || (row_begin & ((1 << dst->y_chroma_shift) - 1)))
+    {
+        PyErr_SetString(PyExc_ValueError,"invalid row band of the destination image");
+        return 0;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+
+    for (plane = VPX_PLANE_Y; ok && plane <= VPX_PLANE_V; plane++)
+    {
+        xs = plane == VPX_PLANE_Y ? 0 : src->x_chroma_shift;
+        ys = plane == VPX_PLANE_Y ? 0 : src->y_chroma_shift;
+
+        sw = (src->d_w + (1 << xs) - 1) >> xs;
+        sh = (src->d_h + (1 << ys) - 1) >> ys;
+        dw = (dst->d_w + (1 << xs) - 1) >> xs;
+        dh = (dst->d_h + (1 << ys) - 1) >> ys;
+
+        band_begin = row_begin >> ys;
+        band_end = row_end == (int) dst->d_h ? dh : row_end >> ys;
+
+        ok = vpx_plane_scale(src->planes[plane], src->stride[plane], sw, sh,
+                             dst->planes[plane], dst->stride[plane], dw, dh,
+                             filter, band_begin, band_end);
+    }
+
+    Py_END_ALLOW_THREADS
+
+    if (!ok)
+    {
+        PyErr_NoMemory();
+        return 0;
+    }
+
+    return row_end - row_begin;
+}
+
+int vpx_img_scale_to(vpx_image_t *src, vpx_image_t *dst, int filter)
+{
+    return vpx_img_scale_rows(src, dst, filter, 0, dst->d_h);
+}
+
+%}
+
 /**\brief Representation of a rectangle on a surface */
 typedef struct vpx_image_rect
 {
@@ -1059,6 +1288,41 @@ typedef struct vpx_scaling_mode
     VPX_SCALING_MODE    v_scaling_mode;  /**< vertical scaling mode   */
 } vpx_scaling_mode_t;
 
+%feature("docstring", "Set encoder internal scaling mode") vpx_codec_set_scale_mode;
+%feature("docstring", "Get an integer value from the codec, or -1 if the control failed") vpx_codec_control_get_int;
+%feature("docstring", "Set an integer value of the codec") vpx_codec_control_set_int;
+
+%inline%{
+
+vpx_codec_err_t vpx_codec_set_scale_mode(vpx_codec_ctx_t *ctx, VPX_SCALING_MODE h_scaling_mode, VPX_SCALING_MODE v_scaling_mode)
+{
+    vpx_scaling_mode_t mode;
+
+    mode.h_scaling_mode = h_scaling_mode;
+    mode.v_scaling_mode = v_scaling_mode;
+
+    return vpx_codec_control_(ctx, VP8E_SET_SCALEMODE, &mode);
+}
+
+vpx_codec_err_t vpx_codec_control_set_int(vpx_codec_ctx_t *ctx, int ctrl_id, int value)
+{
+    return vpx_codec_control_(ctx, ctrl_id, value);
+}
+
+int vpx_codec_control_get_int(vpx_codec_ctx_t *ctx, int ctrl_id)
+{
+    int value = -1;
+
+    if (VPX_CODEC_OK != vpx_codec_control_(ctx, ctrl_id, &value))
+    {
+        return -1;
+    }
+
+    return value;
+}
+
+%}
+
 /*!\brief VP8 encoding mode
  *
  * This defines VP8 encoding mode
@@ -1258,13 +1522,52 @@ typedef struct vpx_codec_cx_pkt
     } data; /**< packet data */
 } vpx_codec_cx_pkt_t; /**< alias for struct vpx_codec_cx_pkt */
 
+%feature("docstring", "Return the next (kind, data) packet in one call, or None at the end of list") vpx_codec_next_cx_data;
+%feature("docstring", "Return the next (kind, data, pts, flags) packet in one call, or None at the end of list") vpx_codec_next_cx_packet;
+
 %inline%{
 
 PyObject* vpx_pkt_get_data(vpx_codec_cx_pkt_t *pkt)
 {
+    if (pkt->kind == VPX_CODEC_PSNR_PKT)
+    {
+        return Py_BuildValue("(dddd)", pkt->data.psnr.psnr[0], pkt->data.psnr.psnr[1],
+                                       pkt->data.psnr.psnr[2], pkt->data.psnr.psnr[3]);
+    }
+
     return PyBuffer_FromReadWriteMemory(pkt->data.frame.buf, pkt->data.frame.sz);
 }
 
+PyObject* vpx_codec_next_cx_data(vpx_codec_ctx_t *ctx, vpx_codec_iter_t *iter)
+{
+    vpx_codec_cx_pkt_t *pkt = (vpx_codec_cx_pkt_t *) vpx_codec_get_cx_data(ctx, iter);
+
+    if (pkt == NULL)
+    {
+        Py_RETURN_NONE;
+    }
+
+    return Py_BuildValue("(iN)", pkt->kind, vpx_pkt_get_data(pkt));
+}
+
+PyObject* vpx_codec_next_cx_packet(vpx_codec_ctx_t *ctx, vpx_codec_iter_t *iter)
+{
+    vpx_codec_cx_pkt_t *pkt = (vpx_codec_cx_pkt_t *) vpx_codec_get_cx_data(ctx, iter);
+
+    if (pkt == NULL)
+    {
+        Py_RETURN_NONE;
+    }
+
+    if (pkt->kind == VPX_CODEC_CX_FRAME_PKT)
+    {
+        return Py_BuildValue("(iNLI)", pkt->kind, vpx_pkt_get_data(pkt),
+                             (PY_LONG_LONG) pkt->data.frame.pts, (unsigned int) pkt->data.frame.flags);
+    }
+
+    return Py_BuildValue("(iNLI)", pkt->kind, vpx_pkt_get_data(pkt), (PY_LONG_LONG) 0, 0);
+}
+
 %}
 
 /*!\brief Rational Number